@@ -2,7 +2,23 @@ import botocore
 import boto3
 import json
 import logging
-from time import sleep
+import math
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import urllib3
+from time import sleep, time, monotonic
+from uuid import uuid4
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+# NumPy is only needed for the local retrieval fast path
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -13,6 +29,28 @@ CATEGORY_FLOW_ID = "2T4MR1JV9Y"
 
 PROD_STAGE = "prod"
 MATTERMOST_API_KEY = ""
+TOKEN_HEADER = "x-chatbot-token"  # Carries the token for requests without a body, such as GET polling
+
+# Asynchronous invocation configuration
+# Requests are queued instead of answered inline when ASYNC_MODE is set or the request asks for it,
+# as long as a job queue is configured. Otherwise they are answered synchronously.
+#
+# The SQS queue needs a dead-letter queue with a redrive policy of maxReceiveCount = JOB_MAX_ATTEMPTS + 1,
+# and its event source mapping needs ReportBatchItemFailures. The worker marks a job FAILED on its last
+# attempt, so the dead-letter queue only receives jobs whose worker crashed or timed out.
+ASYNC_MODE = False
+JOB_QUEUE_URL = ""  # SQS queue URL
+JOB_RESULTS_BUCKET = ""  # S3 bucket holding job results for the SQS queue
+JOB_RESULTS_FOLDER = "conductor-jobs"
+LOCAL_JOB_QUEUE = False  # Use the SQLite stand-in for local testing only, its database is private to one container
+LOCAL_JOB_DATABASE = "/tmp/conductor-jobs.sqlite3"
+JOB_VISIBILITY_TIMEOUT = 300
+JOB_MAX_ATTEMPTS = 3
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+JOB_FAILED_MESSAGE = "Sorry, I was unable to answer your question. Please try again later."
+MATTERMOST_CALLBACK_HOSTS = []  # Hosts that answers may be posted back to
+WORKER_BATCH_SIZE = 10
+WORKER_CONCURRENCY = 4
 
 AURORA_SLEEP_WAIT_TIME = 5
 
@@ -79,6 +117,247 @@ FLOW_CONFIGS = {
 NODE = "FlowInputNode"
 OUTPUTNAME = "document"
 
+http = urllib3.PoolManager()
+
+# Creating clients from the default boto3 session is not thread-safe, but using them is
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service):
+    """
+    Returns a boto3 client shared by every thread in the container.
+    """
+
+    with _clients_lock:
+        if service not in _clients:
+            _clients[service] = boto3.client(service)
+
+        return _clients[service]
+
+# Local retrieval fast path
+# Changes the input sent to the flows below, so it is off until deliberately rolled out
+FAST_PATH_ENABLED = False
+
+# Categories answered with help from the local retrieval index built by the scraper
+FAST_PATH_CATEGORIES = [
+    "PACKAGES",
+    "DATA_FILE_TRANSFER",
+    "JOB_RUN_WALL_TIME"
+]
+
+# Local retrieval index configuration
+# Must match the tokenizer and embedding settings in scraper.py
+RETRIEVAL_INDEX_BUCKET = "palmetto-docs"
+RETRIEVAL_INDEX_FOLDER = "retrieval-index"
+RETRIEVAL_INDEX_PATH = "/tmp/retrieval-index"
+RETRIEVAL_INDEX_VERSION = 2
+RETRIEVAL_INDEX_REFRESH_SECONDS = 300
+RETRIEVAL_INDEX_RETRY_SECONDS = 60
+RETRIEVAL_TOP_K = 4
+RETRIEVAL_CANDIDATES = 50
+RETRIEVAL_TOKEN_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9_.+-]*[a-z0-9+])?")
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+EMBEDDING_DIMENSIONS = 256
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Minimum BM25 score a passage needs to be returned as a documentation link
+RETRIEVAL_MIN_LINK_SCORE = 0.5
+
+# Questions that only ask where documentation lives are answered with links directly
+DOC_LOOKUP_QUESTION_WORDS = ["where", "link", "url"]
+DOC_LOOKUP_DOC_WORDS = ["doc", "docs", "documentation", "guide", "page", "tutorial", "instructions"]
+DOC_LOOKUP_PATTERN = re.compile(
+    rf"\b({'|'.join(DOC_LOOKUP_QUESTION_WORDS)})\b.*\b({'|'.join(DOC_LOOKUP_DOC_WORDS)})\b",
+    re.IGNORECASE
+)
+
+# Query terms ignored by BM25 because they match nearly every passage
+RETRIEVAL_STOPWORDS = set(DOC_LOOKUP_QUESTION_WORDS + DOC_LOOKUP_DOC_WORDS + [
+    "a", "about", "an", "and", "are", "can", "do", "does", "find", "for", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "there", "this", "to", "use", "what", "with", "you"
+])
+
+class RetrievalIndex:
+    """
+    Hybrid BM25 and embedding index over the scraped documentation.
+    Embeddings are memory-mapped from /tmp instead of being copied onto the heap,
+    but every query still scans the full matrix.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+
+        if metadata['version'] != RETRIEVAL_INDEX_VERSION or metadata['dimensions'] != EMBEDDING_DIMENSIONS:
+            raise ValueError(f"Unsupported retrieval index version {metadata['version']}")
+
+        self.run_id = metadata['run_id']
+        self.chunks = metadata['chunks']
+        self.postings = metadata['postings']
+        self.doc_lengths = metadata['doc_lengths']
+        self.avg_doc_length = metadata['avg_doc_length']
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode='r')
+
+    def bm25(self, query):
+        """
+        Scores every passage containing a query term with Okapi BM25.
+        """
+
+        scores = {}
+        total = len(self.chunks)
+
+        for term in set(RETRIEVAL_TOKEN_PATTERN.findall(query.lower())) - RETRIEVAL_STOPWORDS:
+            postings = self.postings.get(term, [])
+            if not postings:
+                continue
+
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+
+            for i, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[i] / self.avg_doc_length)
+                scores[i] = scores.get(i, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        return scores
+
+    def search(self, query, query_embedding=None, top_k=RETRIEVAL_TOP_K):
+        """
+        Returns the top passages for a query, fusing BM25 and embedding rankings with reciprocal rank fusion.
+        Each result carries its BM25 score so callers can tell lexical matches from purely semantic ones.
+        """
+
+        bm25_scores = self.bm25(query)
+        rankings = [sorted(bm25_scores, key=bm25_scores.get, reverse=True)[:RETRIEVAL_CANDIDATES]]
+
+        if query_embedding is not None:
+            similarities = self.embeddings @ np.asarray(query_embedding, dtype=np.float32)
+            count = min(RETRIEVAL_CANDIDATES, len(similarities))
+            candidates = np.argpartition(-similarities, count - 1)[:count]
+            rankings.append([int(i) for i in candidates[np.argsort(-similarities[candidates])]])
+
+        fused = {}
+        for ranking in rankings:
+            for rank, i in enumerate(ranking):
+                fused[i] = fused.get(i, 0.0) + 1 / (RRF_K + rank + 1)
+
+        results = []
+        for i in sorted(fused, key=fused.get, reverse=True)[:top_k]:
+            results.append({**self.chunks[i], 'bm25': bm25_scores.get(i, 0.0)})
+
+        return results
+
+# Loaded lazily on the first fast path question and refreshed while the container is warm
+_retrieval_index = None
+_retrieval_index_checked_at = None
+_retrieval_index_lock = threading.Lock()
+
+def get_retrieval_index():
+    """
+    Returns the latest retrieval index, or None if it is unavailable.
+    The published run is re-checked every RETRIEVAL_INDEX_REFRESH_SECONDS, and a failed load
+    is retried after RETRIEVAL_INDEX_RETRY_SECONDS.
+    """
+
+    global _retrieval_index, _retrieval_index_checked_at
+
+    if np is None:
+        return None
+
+    with _retrieval_index_lock:
+        now = monotonic()
+        wait = RETRIEVAL_INDEX_REFRESH_SECONDS if _retrieval_index is not None else RETRIEVAL_INDEX_RETRY_SECONDS
+
+        if _retrieval_index_checked_at is not None and now - _retrieval_index_checked_at < wait:
+            return _retrieval_index
+
+        _retrieval_index_checked_at = now
+
+        try:
+            s3 = get_client('s3')
+            latest = s3.get_object(Bucket=RETRIEVAL_INDEX_BUCKET, Key=f"{RETRIEVAL_INDEX_FOLDER}/latest.json")
+            latest = json.loads(latest['Body'].read())
+
+            if _retrieval_index is not None and _retrieval_index.run_id == latest['run_id']:
+                return _retrieval_index
+
+            # Each run is downloaded to its own folder so the index being replaced stays intact
+            path = os.path.join(RETRIEVAL_INDEX_PATH, latest['run_id'])
+            os.makedirs(path, exist_ok=True)
+            for name in ["metadata.json", "embeddings.npy"]:
+                s3.download_file(RETRIEVAL_INDEX_BUCKET, f"{latest['folder']}/{name}", os.path.join(path, name))
+
+            previous, _retrieval_index = _retrieval_index, RetrievalIndex(path)
+            logger.info(f"Loaded retrieval index {latest['folder']} with {len(_retrieval_index.chunks)} passages")
+
+            if previous is not None:
+                shutil.rmtree(previous.path, ignore_errors=True)
+
+        except Exception as e:
+            logger.error(f"Failed to load retrieval index: {str(e)}")
+
+        return _retrieval_index
+
+def embed_query(message):
+    """
+    Returns the normalized embedding for a question, or None if the embedding model fails.
+    """
+
+    try:
+        client = get_client('bedrock-runtime')
+        response = client.invoke_model(
+            modelId=EMBEDDING_MODEL_ID,
+            body=json.dumps({
+                'inputText': message,
+                'dimensions': EMBEDDING_DIMENSIONS,
+                'normalize': True
+            })
+        )
+
+        return json.loads(response['body'].read())['embedding']
+
+    except Exception as e:
+        logger.error(f"Failed to embed question, falling back to BM25 only: {str(e)}")
+        return None
+
+def retrieve_passages(message):
+    """
+    Returns the top passages from the local retrieval index, or an empty list if it is unavailable.
+    """
+
+    index = get_retrieval_index()
+    if index is None:
+        return []
+
+    return index.search(message, embed_query(message))
+
+def format_doc_links(passages):
+    """
+    Formats retrieved passages as a markdown list of unique documentation links.
+    """
+
+    links = []
+    seen = set()
+
+    for passage in passages:
+        if passage['url'] in seen:
+            continue
+        seen.add(passage['url'])
+        links.append(f"- [{passage['title']}]({passage['url']})")
+
+    return "Here is the documentation that best matches your question:\n\n" + "\n".join(links)
+
+def format_flow_input(message, passages):
+    """
+    Prepends pre-retrieved passages to the question sent to a flow.
+    """
+
+    context = "\n\n".join(f"Source: {passage['url']}\n{passage['text']}" for passage in passages)
+
+    return f"Relevant documentation:\n\n{context}\n\nQuestion: {message}"
+
 def invoke_flow(client, flow_id, flow_alias, message):
     """Helper function to invoke a flow and process its response"""
     # this forces the operation to repeat if a dependencyFailedException is encountered
@@ -123,40 +402,146 @@ def invoke_flow(client, flow_id, flow_alias, message):
                 logger.error(f"Flow {flow_id} failed to execute: {str(e)}")
                 raise e
 
-def lambda_handler(event, context):
+class SqliteJobQueue:
     """
-    This function determines the category of the question and routes it to the appropriate flow.
-    Supported categories: PALMETTO_HARDWARE, EXCEEDING_STORAGE, DATA_FILE_TRANSFER, PACKAGES
+    Local stand-in for the SQS job queue, storing jobs and results in a SQLite database.
     """
 
-    stage = event.get("context").get("stage")
+    def __init__(self, path):
+        self.path = path
 
-    if stage == PROD_STAGE:
-        token = event.get("body-json").get("token")
-        
-        if token != MATTERMOST_API_KEY:
-            logger.error("Invalid token provided in the request")
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS jobs (receipt INTEGER PRIMARY KEY AUTOINCREMENT, body TEXT, visible_at REAL, receive_count INTEGER DEFAULT 0)")
+            db.execute("CREATE TABLE IF NOT EXISTS results (job_id TEXT PRIMARY KEY, body TEXT)")
 
-            response = {
-                "result": "ERROR",
-                "error": "Invalid token provided in the request"
-            }
+    def connect(self):
+        # A connection per call keeps the queue safe to use from worker threads
+        return sqlite3.connect(self.path, timeout=30)
 
-            return response
+    def enqueue(self, job):
+        with self.connect() as db:
+            db.execute("INSERT INTO jobs (body, visible_at) VALUES (?, ?)", (json.dumps(job), time()))
 
-    # retrieve text from the request
-    original_message = event.get("body-json").get("text")
-    if not original_message:
-        logger.error("No text provided in the request")
+    def receive(self, max_jobs):
+        """
+        Claims up to max_jobs visible jobs, hiding them until JOB_VISIBILITY_TIMEOUT expires.
+        Returns (receipt, job, receive_count) for each job.
+        """
 
-        response = {
-            "result": "ERROR",
-            "error": "No text provided in the request"
-        }
+        db = self.connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                "SELECT receipt, body, receive_count + 1 FROM jobs WHERE visible_at <= ? ORDER BY receipt LIMIT ?",
+                (time(), max_jobs)
+            ).fetchall()
+            db.executemany(
+                "UPDATE jobs SET visible_at = ?, receive_count = receive_count + 1 WHERE receipt = ?",
+                [(time() + JOB_VISIBILITY_TIMEOUT, receipt) for receipt, _, _ in rows]
+            )
+            db.commit()
+        finally:
+            db.close()
 
-        return response
+        return [(receipt, json.loads(body), receive_count) for receipt, body, receive_count in rows]
 
-    client = boto3.client('bedrock-agent-runtime')
+    def delete(self, receipt):
+        with self.connect() as db:
+            db.execute("DELETE FROM jobs WHERE receipt = ?", (receipt,))
+
+    def save_result(self, job_id, result):
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO results (job_id, body) VALUES (?, ?)", (job_id, json.dumps(result)))
+
+    def load_result(self, job_id):
+        with self.connect() as db:
+            row = db.execute("SELECT body FROM results WHERE job_id = ?", (job_id,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+class SqsJobQueue:
+    """
+    Durable job queue backed by SQS, with job results stored in S3.
+    """
+
+    def __init__(self, queue_url, results_bucket):
+        self.queue_url = queue_url
+        self.results_bucket = results_bucket
+        self.sqs = get_client('sqs')
+        self.s3 = get_client('s3')
+
+    def enqueue(self, job):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(job))
+
+    def receive(self, max_jobs):
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_jobs, 10),
+            VisibilityTimeout=JOB_VISIBILITY_TIMEOUT,
+            AttributeNames=['ApproximateReceiveCount']
+        )
+
+        return [
+            (message['ReceiptHandle'], json.loads(message['Body']), int(message['Attributes']['ApproximateReceiveCount']))
+            for message in response.get('Messages', [])
+        ]
+
+    def delete(self, receipt):
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+
+    def save_result(self, job_id, result):
+        self.s3.put_object(
+            Bucket=self.results_bucket,
+            Key=f"{JOB_RESULTS_FOLDER}/{job_id}.json",
+            Body=json.dumps(result).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    def load_result(self, job_id):
+        try:
+            response = self.s3.get_object(Bucket=self.results_bucket, Key=f"{JOB_RESULTS_FOLDER}/{job_id}.json")
+            return json.loads(response['Body'].read())
+
+        except Exception as e:
+            # S3 returns AccessDenied instead of NoSuchKey for missing keys when the role cannot list the bucket
+            if isinstance(e, botocore.exceptions.ClientError) and e.response['Error']['Code'] in ['NoSuchKey', '404', 'AccessDenied', '403']:
+                return None
+            raise
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """
+    Returns the SQS job queue when JOB_QUEUE_URL is configured, the SQLite stand-in when LOCAL_JOB_QUEUE is set,
+    and None otherwise.
+    """
+
+    global _job_queue
+
+    with _job_queue_lock:
+        if _job_queue is None:
+            if JOB_QUEUE_URL:
+                _job_queue = SqsJobQueue(JOB_QUEUE_URL, JOB_RESULTS_BUCKET)
+            elif LOCAL_JOB_QUEUE:
+                _job_queue = SqliteJobQueue(LOCAL_JOB_DATABASE)
+
+        return _job_queue
+
+def is_allowed_callback(callback_url):
+    """
+    Checks that a callback URL points at an allow-listed Mattermost host over HTTPS.
+    """
+
+    parsed = urlparse(callback_url or "")
+
+    return parsed.scheme == "https" and parsed.hostname in MATTERMOST_CALLBACK_HOSTS
+
+def answer_question(client, original_message, raise_errors=False):
+    """
+    Determines the category of the question and routes it to the appropriate flow.
+    Errors are returned as an ERROR response unless raise_errors is set.
+    """
 
     try:
         # First, determine the category
@@ -170,15 +555,30 @@ def lambda_handler(event, context):
         category = category.strip()
         logger.info(f"Category determined: {category}")
 
+        passages = retrieve_passages(original_message) if FAST_PATH_ENABLED and category in FAST_PATH_CATEGORIES else []
+        fast_path = None
+
+        # Only passages matching a meaningful query term well enough are offered as links
+        link_passages = [passage for passage in passages if passage['bm25'] >= RETRIEVAL_MIN_LINK_SCORE]
+
         # Check if we handle this category
-        if category in FLOW_CONFIGS:
+        if link_passages and DOC_LOOKUP_PATTERN.search(original_message):
+            logger.info(f"Answering {category} documentation lookup from local retrieval index")
+            fast_path = "links"
+            final_response = format_doc_links(link_passages)
+        elif category in FLOW_CONFIGS:
             logger.info(f"Routing question to {category} flow")
             flow_config = FLOW_CONFIGS[category]
+
+            if passages:
+                logger.info(f"Passing {len(passages)} pre-retrieved passages to {category} flow")
+                fast_path = "passages"
+
             final_response = invoke_flow(
                 client,
                 flow_config["id"],
                 flow_config["alias"],
-                original_message  # Send the original question
+                format_flow_input(original_message, passages) if passages else original_message
             )
         else:  # Category not in list
             logger.info(f"Unhandled category: {category}, routing to default flow")
@@ -198,13 +598,17 @@ def lambda_handler(event, context):
             "response_type": "comment",
             "text": final_response,
             "category": category,
-            "handled": category in FLOW_CONFIGS
+            "handled": category in FLOW_CONFIGS,
+            "fast_path": fast_path
         }
 
         logger.info(f"Returning response for category {category}")
         return response
 
     except Exception as e:
+        if raise_errors:
+            raise
+
         error_message = f"Error processing request: {str(e)}"
         logger.error(error_message)
 
@@ -213,3 +617,266 @@ def lambda_handler(event, context):
             "error": error_message
         }
 
+def post_callback(job, response):
+    """
+    Posts an answer back to the job's callback URL. Failures are logged so the job is not answered again.
+    """
+
+    if not is_allowed_callback(job.get('callback_url')):
+        return
+
+    try:
+        callback = http.request(
+            'POST',
+            job['callback_url'],
+            body=json.dumps({
+                "response_type": "comment",
+                "text": response.get("text") or JOB_FAILED_MESSAGE
+            }),
+            headers={'Content-Type': 'application/json'},
+            redirect=False
+        )
+
+        if callback.status >= 300:
+            logger.error(f"Callback for job {job['job_id']} failed (HTTP {callback.status})")
+
+    except Exception as e:
+        logger.error(f"Callback for job {job['job_id']} failed: {str(e)}")
+
+def process_job(client, queue, job, receive_count):
+    """
+    Answers a queued question, stores the result and posts it to the job's callback URL if it has one.
+    Raises while attempts remain so the queue redelivers the job, and marks it FAILED on the last attempt.
+    """
+
+    logger.info(f"Processing job {job['job_id']} (attempt {receive_count} of {JOB_MAX_ATTEMPTS})")
+
+    try:
+        response = answer_question(client, job['text'], raise_errors=True)
+    except Exception as e:
+        if receive_count < JOB_MAX_ATTEMPTS:
+            logger.error(f"Job {job['job_id']} failed, leaving it for redelivery: {str(e)}")
+            raise
+
+        logger.error(f"Job {job['job_id']} failed after {receive_count} attempts: {str(e)}")
+        response = {
+            "result": "ERROR",
+            "error": JOB_FAILED_MESSAGE
+        }
+
+    queue.save_result(job['job_id'], {"status": "DONE" if response['result'] == "OK" else "FAILED", **response})
+    post_callback(job, response)
+
+    logger.info(f"Job {job['job_id']} finished with result {response['result']}")
+
+def process_record(client, queue, record):
+    """
+    Parses an SQS record and answers its job. Malformed records are logged and dropped.
+    """
+
+    try:
+        job = json.loads(record['body'])
+        receive_count = int(record['attributes']['ApproximateReceiveCount'])
+
+        if not JOB_ID_PATTERN.fullmatch(job.get('job_id', '')) or not job.get('text'):
+            raise ValueError("missing job_id or text")
+
+    except Exception as e:
+        logger.error(f"Dropping malformed message {record.get('messageId')}: {str(e)}")
+        return
+
+    process_job(client, queue, job, receive_count)
+
+def enqueue_question(queue, original_message, callback_url):
+    """
+    Queues a question for the worker and returns an acknowledgement with its job ID.
+    """
+
+    if callback_url and not is_allowed_callback(callback_url):
+        logger.error(f"Ignoring callback URL that is not an allowed Mattermost host: {callback_url}")
+        callback_url = None
+
+    job = {
+        "job_id": uuid4().hex,
+        "text": original_message,
+        "callback_url": callback_url
+    }
+
+    try:
+        queue.save_result(job['job_id'], {"status": "QUEUED"})
+        queue.enqueue(job)
+
+    except Exception as e:
+        error_message = f"Error queuing request: {str(e)}"
+        logger.error(error_message)
+
+        # A job whose message was never sent must not be reported as queued
+        try:
+            queue.save_result(job['job_id'], {"status": "FAILED", "result": "ERROR", "error": JOB_FAILED_MESSAGE})
+        except Exception as e:
+            logger.error(f"Failed to mark job {job['job_id']} as failed: {str(e)}")
+
+        return {
+            "result": "ERROR",
+            "error": error_message
+        }
+
+    logger.info(f"Queued job {job['job_id']}")
+
+    return {
+        "result": "OK",
+        "response_type": "ephemeral",
+        "text": (
+            "Your question has been received. The answer will be posted here once it is ready." if callback_url
+            else f"Your question has been received. Poll with job_id {job['job_id']} for the answer."
+        ),
+        "job_id": job['job_id']
+    }
+
+def poll_job(job_id):
+    """
+    Returns the stored status and answer of a queued question.
+    """
+
+    queue = get_job_queue()
+
+    if queue is None:
+        return {
+            "result": "ERROR",
+            "error": "Asynchronous mode is not configured"
+        }
+
+    try:
+        result = queue.load_result(job_id) if JOB_ID_PATTERN.fullmatch(job_id) else None
+
+    except Exception as e:
+        error_message = f"Error polling request: {str(e)}"
+        logger.error(error_message)
+
+        return {
+            "result": "ERROR",
+            "error": error_message
+        }
+
+    if result is None:
+        return {
+            "result": "ERROR",
+            "error": f"Unknown job {job_id}"
+        }
+
+    return {"job_id": job_id, **result}
+
+def worker_handler(event, context):
+    """
+    Answers queued questions with bounded concurrency.
+    Invoked by an SQS event source mapping, or with any other event to drain the queue directly.
+    """
+
+    queue = get_job_queue()
+
+    if queue is None:
+        raise Exception("No job queue configured. Set JOB_QUEUE_URL or LOCAL_JOB_QUEUE.")
+
+    # Shared state is set up before any worker threads start
+    client = get_client('bedrock-agent-runtime')
+    if FAST_PATH_ENABLED:
+        get_retrieval_index()
+
+    # SQS event source mapping delivers a batch and deletes the messages that are not reported as failed
+    if "Records" in event:
+        with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY) as executor:
+            futures = {
+                record['messageId']: executor.submit(process_record, client, queue, record)
+                for record in event['Records']
+            }
+
+        failures = []
+        for message_id, future in futures.items():
+            if future.exception():
+                failures.append({"itemIdentifier": message_id})
+
+        return {"batchItemFailures": failures}
+
+    # Otherwise pull batches from the queue until it is empty
+    processed = 0
+
+    while True:
+        batch = queue.receive(WORKER_BATCH_SIZE)
+        if not batch:
+            break
+
+        with ThreadPoolExecutor(max_workers=WORKER_CONCURRENCY) as executor:
+            futures = {
+                receipt: executor.submit(process_job, client, queue, job, receive_count)
+                for receipt, job, receive_count in batch
+            }
+
+        for receipt, future in futures.items():
+            # Failed jobs stay on the queue and become visible again after the visibility timeout
+            if future.exception():
+                continue
+
+            queue.delete(receipt)
+            processed += 1
+
+    logger.info(f"Worker processed {processed} jobs")
+
+    return {"processed": processed}
+
+def lambda_handler(event, context):
+    """
+    This function determines the category of the question and routes it to the appropriate flow.
+    Supported categories: PALMETTO_HARDWARE, EXCEEDING_STORAGE, DATA_FILE_TRANSFER, PACKAGES
+
+    In async mode the question is queued for worker_handler and a job ID is returned immediately.
+    Passing job_id polls for the answer of a queued question.
+    """
+
+    stage = event.get("context").get("stage")
+    body = event.get("body-json") or {}
+    querystring = (event.get("params") or {}).get("querystring") or {}
+    headers = {key.lower(): value for key, value in ((event.get("params") or {}).get("header") or {}).items()}
+
+    if stage == PROD_STAGE:
+        # The token is never read from the query string so it stays out of access logs
+        token = body.get("token") or headers.get(TOKEN_HEADER)
+        
+        if token != MATTERMOST_API_KEY:
+            logger.error("Invalid token provided in the request")
+
+            response = {
+                "result": "ERROR",
+                "error": "Invalid token provided in the request"
+            }
+
+            return response
+
+    # return the status of a queued question
+    job_id = body.get("job_id") or querystring.get("job_id")
+    if job_id:
+        return poll_job(job_id)
+
+    # retrieve text from the request
+    original_message = body.get("text")
+    if not original_message:
+        logger.error("No text provided in the request")
+
+        response = {
+            "result": "ERROR",
+            "error": "No text provided in the request"
+        }
+
+        return response
+
+    if ASYNC_MODE or querystring.get("async") == "true":
+        queue = get_job_queue()
+
+        if queue is not None:
+            return enqueue_question(queue, original_message, body.get("response_url"))
+
+        logger.error("Asynchronous mode requested but no job queue is configured, answering synchronously")
+
+    client = boto3.client('bedrock-agent-runtime')
+
+    return answer_question(client, original_message)
+
@@ -4,19 +4,32 @@ import re
 import json
 import urllib3
 import scrapy
+import heapq
 import logging
-from time import sleep
+from time import sleep, perf_counter
+from datetime import datetime, timezone
+from contextlib import contextmanager
 import boto3, botocore
 from hashlib import sha256
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from scrapy.crawler import CrawlerProcess
 from urllib.parse import urlparse, urljoin, quote_plus
 
+# NumPy is only needed to build the local retrieval index
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # AWS S3 Configuration
 DOCUMENTATION_BUCKET = "palmetto-docs"
 POLICY_BUCKET = "ccit-docs"
 GITHUB_S3_FOLDER = "github-md-files"
 WEBSITE_S3_FOLDER = "website-html-files"
 BOOK_S3_FOLDER = "book-pdf-files"
+REPORT_S3_FOLDER = "run-reports"
+INDEX_S3_FOLDER = "retrieval-index"
 
 AURORA_SLEEP_WAIT_TIME = 5
 
@@ -69,6 +82,22 @@ POLICY_SITES = [
 
 POLICY_BOOK_LIST = "https://clemsonpub.cfmnetwork.com/PublicPageViewList.aspx?id=16"
 POLICY_BOOK_DOWNLOAD = "https://clemsonpub.cfmnetwork.com/BookPrint.aspx"
+POLICY_BOOK_SOURCE = "policy-books"
+
+# Run report configuration
+REPORT_SCHEMA_VERSION = 1
+SLOWEST_URL_COUNT = 10
+METRICS_NAMESPACE = "PalmettoChatbot/Scraper"
+
+# Local retrieval index configuration
+# Must match the tokenizer and embedding settings in conductor.py
+INDEX_VERSION = 2
+INDEX_LOCAL_PATH = "/tmp/retrieval-index"
+INDEX_CHUNK_WORDS = 200
+INDEX_TOKEN_PATTERN = re.compile(r"[a-z0-9](?:[a-z0-9_.+-]*[a-z0-9+])?")
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+EMBEDDING_DIMENSIONS = 256
+EMBEDDING_WORKERS = 8
 
 # Initial setup configuration
 http = urllib3.PoolManager()
@@ -78,39 +107,255 @@ logger.setLevel(logging.INFO)
 
 s3_client = boto3.client('s3')
 
-def upload_to_s3(file_key: str, s3_bucket: str, data):
+# Counters tracked for every source in the run report
+SOURCE_COUNTERS = [
+    'pages_fetched',
+    'fetch_errors',
+    'bytes_downloaded',
+    'uploads',
+    'skipped_unchanged',
+    'skipped_content_type',
+    'ignored_path_links',
+    'offdomain_links',
+]
+
+# Phases timed for every source in the run report
+SOURCE_PHASES = [
+    'download',
+    'hash',
+    's3',
+    'link_extraction',
+]
+
+# EMF units for source metrics that are neither counts nor timings
+METRIC_UNITS = {
+    'bytes_downloaded': 'Bytes',
+    'skip_ratio': 'None',
+}
+
+# Run-wide stages timed in the run report
+RUN_STAGES = [
+    'github',
+    'crawl',
+    'books',
+    'sync',
+    'retrieval_index',
+]
+
+class RunMetrics:
+    """
+    Collects per-source counters, phase timings and slowest URLs for a scraper run.
+    A new instance must be created for every run so warm containers do not carry over counters.
+    """
+
+    def __init__(self):
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self.started = perf_counter()
+        self.sources = {}
+        self.stages = {stage: 0.0 for stage in RUN_STAGES}
+
+    def source(self, name):
+        if name not in self.sources:
+            self.sources[name] = {
+                'counters': {counter: 0 for counter in SOURCE_COUNTERS},
+                'seconds': {phase: 0.0 for phase in SOURCE_PHASES},
+                'slowest_urls': []
+            }
+
+        return self.sources[name]
+
+    def add(self, name, counter, amount=1):
+        self.source(name)['counters'][counter] += amount
+
+    def add_time(self, name, phase, seconds):
+        self.source(name)['seconds'][phase] += seconds
+
+    @contextmanager
+    def timed_stage(self, stage):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] += perf_counter() - start
+
+    @contextmanager
+    def timed(self, name, phase):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, phase, perf_counter() - start)
+
+    def record_fetch(self, name, url, seconds, size):
+        """
+        Records a successfully downloaded page and keeps the slowest URLs per source.
+        """
+
+        self.add(name, 'pages_fetched')
+        self.add(name, 'bytes_downloaded', size)
+        self.add_time(name, 'download', seconds)
+
+        slowest = self.source(name)['slowest_urls']
+        entry = (round(seconds, 4), url)
+
+        if len(slowest) < SLOWEST_URL_COUNT:
+            heapq.heappush(slowest, entry)
+        else:
+            heapq.heappushpop(slowest, entry)
+
+    def report(self, status):
+        """
+        Builds the JSON run report. Sources and keys are sorted so reports diff cleanly across runs.
+        """
+
+        sources = {}
+        for name in sorted(self.sources):
+            source = self.sources[name]
+            counters = source['counters']
+            checked = counters['uploads'] + counters['skipped_unchanged']
+
+            sources[name] = {
+                'counters': dict(counters),
+                'seconds': {phase: round(value, 4) for phase, value in source['seconds'].items()},
+                'skip_ratio': round(counters['skipped_unchanged'] / checked, 4) if checked else 0.0,
+                'slowest_urls': [
+                    {'url': url, 'seconds': seconds}
+                    for seconds, url in sorted(source['slowest_urls'], reverse=True)
+                ]
+            }
+
+        return {
+            'schema_version': REPORT_SCHEMA_VERSION,
+            'run_id': self.run_id,
+            'status': status,
+            'duration_seconds': round(perf_counter() - self.started, 4),
+            'stage_seconds': {stage: round(value, 4) for stage, value in self.stages.items()},
+            'totals': {
+                counter: sum(source['counters'][counter] for source in self.sources.values())
+                for counter in SOURCE_COUNTERS
+            },
+            'sources': sources
+        }
+
+    def emit_emf(self, report):
+        """
+        Prints one CloudWatch Embedded Metric Format record for the run and one per source.
+        """
+
+        metric_names = SOURCE_COUNTERS + [f"{phase}_seconds" for phase in SOURCE_PHASES] + ['skip_ratio']
+        timestamp = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+        run_record = {
+            '_aws': {
+                'Timestamp': timestamp,
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [[]],
+                    'Metrics': [
+                        {'Name': metric, 'Unit': 'Seconds'}
+                        for metric in ['duration_seconds'] + [f"{stage}_seconds" for stage in RUN_STAGES]
+                    ]
+                }]
+            },
+            'RunId': report['run_id'],
+            'Status': report['status'],
+            'duration_seconds': report['duration_seconds'],
+            **{f"{stage}_seconds": value for stage, value in report['stage_seconds'].items()}
+        }
+
+        # EMF records must be written to stdout as a single raw JSON line
+        print(json.dumps(run_record))
+
+        for name, source in report['sources'].items():
+            record = {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': METRICS_NAMESPACE,
+                        'Dimensions': [['Source']],
+                        'Metrics': [
+                            {'Name': metric, 'Unit': 'Seconds' if metric.endswith('_seconds') else METRIC_UNITS.get(metric, 'Count')}
+                            for metric in metric_names
+                        ]
+                    }]
+                },
+                'Source': name,
+                'RunId': report['run_id'],
+                'skip_ratio': source['skip_ratio'],
+                **source['counters'],
+                **{f"{phase}_seconds": value for phase, value in source['seconds'].items()}
+            }
+
+            print(json.dumps(record))
+
+# Replaced at the start of every invocation by lambda_handler
+run_metrics = RunMetrics()
+
+# Documentation text collected during the run for the retrieval index
+# Format: (url, title, text)
+# Replaced at the start of every invocation by lambda_handler
+index_documents = []
+
+def upload_to_s3(file_key: str, s3_bucket: str, data, source: str):
     """
     Uploads data to an s3 bucket with a specified key.
     """
 
-    local_hash = sha256(data).hexdigest()
+    with run_metrics.timed(source, 'hash'):
+        local_hash = sha256(data).hexdigest()
 
-    try:
-        response = s3_client.head_object(Bucket=s3_bucket, Key=file_key)
+    with run_metrics.timed(source, 's3'):
+        try:
+            response = s3_client.head_object(Bucket=s3_bucket, Key=file_key)
 
-        remote_hash = response['Metadata'].get('sha256', '')
+            remote_hash = response['Metadata'].get('sha256', '')
 
-        if local_hash == remote_hash:
-            logger.info(f"Skipped upload because {file_key} unchanged")
-            return
-        else:
-            logger.info(f"Uploading {file_key} because it has changed")
+            if local_hash == remote_hash:
+                logger.info(f"Skipped upload because {file_key} unchanged")
+                run_metrics.add(source, 'skipped_unchanged')
+                return
+            else:
+                logger.info(f"Uploading {file_key} because it has changed")
 
-    except Exception as e:
-        if isinstance(e, botocore.exceptions.ClientError) and e.response['Error']['Code'] == '404':
-            logger.info(f"Uploading {file_key} because it does not exist")
-        else:
-            raise
+        except Exception as e:
+            if isinstance(e, botocore.exceptions.ClientError) and e.response['Error']['Code'] == '404':
+                logger.info(f"Uploading {file_key} because it does not exist")
+            else:
+                raise
 
-    s3_client.upload_fileobj(
-            Fileobj=io.BytesIO(data),
-            Bucket=s3_bucket,
-            Key=file_key,
-            ExtraArgs={'Metadata': {'sha256': local_hash}}
-    )
+        s3_client.upload_fileobj(
+                Fileobj=io.BytesIO(data),
+                Bucket=s3_bucket,
+                Key=file_key,
+                ExtraArgs={'Metadata': {'sha256': local_hash}}
+        )
 
+    run_metrics.add(source, 'uploads')
     logger.info(f"Uploaded {file_key} with hash {local_hash} to {s3_bucket}")
 
+def publish_run_report(status):
+    """
+    Uploads the run report to S3 and emits its metrics in EMF.
+    Publishing failures are logged so they never replace a step failure or fail a successful run.
+    """
+
+    report = run_metrics.report(status)
+
+    try:
+        data = json.dumps(report, indent=2, sort_keys=True).encode('utf-8')
+
+        for file_key in [os.path.join(REPORT_S3_FOLDER, f"{report['run_id']}.json"), os.path.join(REPORT_S3_FOLDER, "latest.json")]:
+            s3_client.put_object(Bucket=DOCUMENTATION_BUCKET, Key=file_key, Body=data, ContentType='application/json')
+
+        run_metrics.emit_emf(report)
+
+        logger.info(f"Published run report {report['run_id']} with totals {report['totals']}")
+
+    except Exception as e:
+        logger.error(f"Failed to publish run report {report['run_id']}: {str(e)}")
+
+    return report
+
 
 def get_github_files(repo_url, file_type):
     """
@@ -147,22 +392,36 @@ def download_and_upload_github(repo_url_list):
     logger.info(f"\nDownloading files from GitHub and uploading to S3...\n")
 
     for repo_url in repo_url_list:
+        parsed_repo = urlparse(repo_url)
+        repo_name = parsed_repo.path.strip("/").split("/")[-1]
+        source = f"github:{repo_name}"
+
         for file_type in ACCEPTED_FILE_EXTENSIONS:
             files, default_branch = get_github_files(repo_url, file_type)
 
             for file in files:
                 file_url = f"{repo_url}/raw/{default_branch}/{file['path']}"
+
+                start = perf_counter()
                 response = http.request('GET', file_url)
+                elapsed = perf_counter() - start
 
                 if response.status != 200:
                     logger.error(f"Failed to fetch file: {file['path']} (HTTP {response.status})")
+                    run_metrics.add(source, 'fetch_errors')
                     continue
 
-                parsed_repo = urlparse(repo_url)
+                run_metrics.record_fetch(source, file_url, elapsed, len(response.data))
 
-                repo_name = parsed_repo.path.strip("/").split("/")[-1]
                 file_key = os.path.join(GITHUB_S3_FOLDER, repo_name, file['path'])
-                upload_to_s3(file_key, DOCUMENTATION_BUCKET, response.data)
+                upload_to_s3(file_key, DOCUMENTATION_BUCKET, response.data, source)
+
+                if not file['path'].endswith('.pdf'):
+                    index_documents.append((
+                        f"{repo_url}/blob/{default_branch}/{file['path']}",
+                        file['path'],
+                        response.data.decode('utf-8', errors='ignore')
+                    ))
 
 def download_and_upload_books():
     """
@@ -175,14 +434,20 @@ def download_and_upload_books():
 
     for book in book_list:
         book_url = f"{POLICY_BOOK_DOWNLOAD}?IsPDF=1&BookId={book}"
+
+        start = perf_counter()
         response = http.request('GET', book_url)
+        elapsed = perf_counter() - start
 
         if response.status != 200:
             print(f"Failed to fetch book {book} (HTTP {response.status})")
+            run_metrics.add(POLICY_BOOK_SOURCE, 'fetch_errors')
             continue
 
+        run_metrics.record_fetch(POLICY_BOOK_SOURCE, book_url, elapsed, len(response.data))
+
         file_key = os.path.join(BOOK_S3_FOLDER, f"{book}.pdf")
-        upload_to_s3(file_key, POLICY_BUCKET, response.data)
+        upload_to_s3(file_key, POLICY_BUCKET, response.data, POLICY_BOOK_SOURCE)
 
 
 class WebsiteSpider(scrapy.Spider):
@@ -196,15 +461,30 @@ class WebsiteSpider(scrapy.Spider):
             self.start_urls = websites
             self.allowed_domains = [urlparse(url).netloc for url in websites]
 
+    def start_requests(self):
+        for url in self.start_urls:
+            yield scrapy.Request(url, callback=self.parse, errback=self.errback)
+
+    def errback(self, failure):
+        # Non-2xx responses and download errors never reach parse, so they are counted here
+        source = urlparse(failure.request.url).netloc
+        run_metrics.add(source, 'fetch_errors')
+        self.logger.info(f"Failed to fetch {failure.request.url}: {failure.getErrorMessage()}")
+
     def parse(self, response):
         content_type = response.headers.get('Content-Type', b'').decode('utf-8')
 
+        parsed_url = urlparse(response.url)
+        source = parsed_url.netloc
+
+        # Scrapy records the time spent downloading each response in its meta
+        run_metrics.record_fetch(source, response.url, response.meta.get('download_latency', 0.0), len(response.body))
+
         # Ignoring invalid media
         if not any(valid_type in content_type for valid_type in ACCEPTED_CONTENT_TYPES):
+            run_metrics.add(source, 'skipped_content_type')
             return
 
-        parsed_url = urlparse(response.url)
-
         url_path = os.path.dirname(parsed_url.path)
         url_endpoint = os.path.basename(parsed_url.path) or "index"
 
@@ -226,28 +506,46 @@ class WebsiteSpider(scrapy.Spider):
         s3_bucket = DOCUMENTATION_BUCKET if any(parsed_url.netloc in site for site in DOCUMENTATION_SITES) else POLICY_BUCKET
 
         # Upload new or changed content
-        upload_to_s3(file_key, s3_bucket, response.body)
-
-        for link in response.css("a::attr(href)").getall():
-            # Skipping recursive and invalid links
-            if link.startswith("#") or link.startswith("mailto:"):
-                continue
-
-            dest_url = response.urljoin(link)
-            parsed_dest_url = urlparse(dest_url)
-
-            # Prevents from crossing into separate subdomains
-            if parsed_dest_url.netloc not in self.allowed_domains:
-                logger.info(f"Skipping subdomain or external link: {dest_url}")
-                continue
-
-            # Prevents from traversing any ignored paths
-            for ignore in IGNORED_PATHS.get(parsed_dest_url.netloc, []):
-                if parsed_dest_url.path.startswith(ignore):
-                    self.logger.info(f"Skipping link to {dest_url}")
-                    break
+        upload_to_s3(file_key, s3_bucket, response.body, source)
+
+        # Only documentation is served from the local retrieval index
+        if s3_bucket == DOCUMENTATION_BUCKET and 'text/pdf' not in content_type:
+            if 'text/html' in content_type:
+                title = response.css("title::text").get(default=response.url).strip()
+                text = " ".join(response.xpath("//body//text()[not(ancestor::script) and not(ancestor::style)]").getall())
             else:
-                yield response.follow(link, callback=self.parse)
+                title = url_endpoint
+                text = response.text
+
+            index_documents.append((response.url, title, text))
+
+        requests = []
+
+        with run_metrics.timed(source, 'link_extraction'):
+            for link in response.css("a::attr(href)").getall():
+                # Skipping recursive and invalid links
+                if link.startswith("#") or link.startswith("mailto:"):
+                    continue
+
+                dest_url = response.urljoin(link)
+                parsed_dest_url = urlparse(dest_url)
+
+                # Prevents from crossing into separate subdomains
+                if parsed_dest_url.netloc not in self.allowed_domains:
+                    logger.info(f"Skipping subdomain or external link: {dest_url}")
+                    run_metrics.add(source, 'offdomain_links')
+                    continue
+
+                # Prevents from traversing any ignored paths
+                for ignore in IGNORED_PATHS.get(parsed_dest_url.netloc, []):
+                    if parsed_dest_url.path.startswith(ignore):
+                        self.logger.info(f"Skipping link to {dest_url}")
+                        run_metrics.add(source, 'ignored_path_links')
+                        break
+                else:
+                    requests.append(response.follow(link, callback=self.parse, errback=self.errback))
+
+        yield from requests
 
 def run_scraper(websites):
     """
@@ -264,6 +562,163 @@ def run_scraper(websites):
     process.crawl(WebsiteSpider, websites=websites)
     process.start()
 
+def tokenize(text):
+    """
+    Splits text into lowercase terms for BM25.
+    """
+
+    return INDEX_TOKEN_PATTERN.findall(text.lower())
+
+def chunk_documents(documents):
+    """
+    Splits documents into passages of roughly INDEX_CHUNK_WORDS words.
+    """
+
+    chunks = []
+    seen = set()
+
+    for url, title, text in documents:
+        # Scrapy may reach the same page through several links
+        if url in seen:
+            continue
+        seen.add(url)
+
+        words = text.split()
+        for start in range(0, len(words), INDEX_CHUNK_WORDS):
+            chunks.append({
+                'url': url,
+                'title': title,
+                'text': " ".join(words[start:start + INDEX_CHUNK_WORDS])
+            })
+
+    return chunks
+
+def embed_text(client, text):
+    """
+    Returns the normalized embedding for a passage of text.
+    """
+
+    response = client.invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        body=json.dumps({
+            'inputText': text,
+            'dimensions': EMBEDDING_DIMENSIONS,
+            'normalize': True
+        })
+    )
+
+    return json.loads(response['body'].read())['embedding']
+
+def load_previous_embeddings():
+    """
+    Returns the embeddings of the latest published index keyed by the sha256 of each passage,
+    or an empty dictionary if there is no compatible previous index.
+    """
+
+    try:
+        latest = s3_client.get_object(Bucket=DOCUMENTATION_BUCKET, Key=os.path.join(INDEX_S3_FOLDER, "latest.json"))
+        folder = json.loads(latest['Body'].read())['folder']
+
+        previous_path = os.path.join(INDEX_LOCAL_PATH, "previous")
+        os.makedirs(previous_path, exist_ok=True)
+
+        for name in ["metadata.json", "embeddings.npy"]:
+            s3_client.download_file(DOCUMENTATION_BUCKET, os.path.join(folder, name), os.path.join(previous_path, name))
+
+        with open(os.path.join(previous_path, "metadata.json")) as f:
+            metadata = json.load(f)
+
+        if metadata['version'] != INDEX_VERSION or metadata['embedding_model'] != EMBEDDING_MODEL_ID or metadata['dimensions'] != EMBEDDING_DIMENSIONS:
+            logger.info(f"Previous retrieval index {folder} is incompatible. Embedding every passage.")
+            return {}
+
+        embeddings = np.load(os.path.join(previous_path, "embeddings.npy"))
+
+        return {
+            sha256(chunk['text'].encode('utf-8')).hexdigest(): embeddings[i]
+            for i, chunk in enumerate(metadata['chunks'])
+        }
+
+    except Exception as e:
+        logger.info(f"No previous retrieval index to reuse embeddings from: {str(e)}")
+        return {}
+
+def build_retrieval_index(documents):
+    """
+    Builds the BM25 postings and embedding matrix used by the conductor's local retrieval fast path
+    and uploads them to S3.
+    """
+
+    if np is None:
+        logger.error("NumPy is not installed. Skipping retrieval index build.")
+        return
+
+    start = perf_counter()
+    chunks = chunk_documents(documents)
+
+    if not chunks:
+        logger.info("No documentation collected. Skipping retrieval index build.")
+        return
+
+    logger.info(f"Building retrieval index from {len(chunks)} passages...")
+
+    postings = {}
+    doc_lengths = []
+
+    for i, chunk in enumerate(chunks):
+        terms = Counter(tokenize(chunk['title'] + " " + chunk['text']))
+        doc_lengths.append(sum(terms.values()))
+
+        for term, frequency in terms.items():
+            postings.setdefault(term, []).append([i, frequency])
+
+    # Only passages whose text changed since the previous index are sent to the embedding model
+    previous = load_previous_embeddings()
+    hashes = [sha256(chunk['text'].encode('utf-8')).hexdigest() for chunk in chunks]
+    missing = [i for i, digest in enumerate(hashes) if digest not in previous]
+
+    logger.info(f"Reusing {len(chunks) - len(missing)} embeddings and embedding {len(missing)} new or changed passages")
+
+    client = boto3.client('bedrock-runtime')
+    with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+        new_embeddings = dict(zip(missing, executor.map(lambda i: embed_text(client, chunks[i]['text']), missing)))
+
+    embeddings = [new_embeddings[i] if i in new_embeddings else previous[digest] for i, digest in enumerate(hashes)]
+
+    metadata = {
+        'version': INDEX_VERSION,
+        'run_id': run_metrics.run_id,
+        'embedding_model': EMBEDDING_MODEL_ID,
+        'dimensions': EMBEDDING_DIMENSIONS,
+        'avg_doc_length': sum(doc_lengths) / len(doc_lengths),
+        'doc_lengths': doc_lengths,
+        'chunks': chunks,
+        'postings': postings
+    }
+
+    os.makedirs(INDEX_LOCAL_PATH, exist_ok=True)
+    metadata_path = os.path.join(INDEX_LOCAL_PATH, "metadata.json")
+    embeddings_path = os.path.join(INDEX_LOCAL_PATH, "embeddings.npy")
+
+    with open(metadata_path, 'w') as f:
+        json.dump(metadata, f)
+
+    np.save(embeddings_path, np.asarray(embeddings, dtype=np.float32))
+
+    # Versioned by run so the conductor never pairs metadata and embeddings from different runs
+    index_folder = os.path.join(INDEX_S3_FOLDER, run_metrics.run_id)
+    for path in [metadata_path, embeddings_path]:
+        s3_client.upload_file(path, DOCUMENTATION_BUCKET, os.path.join(index_folder, os.path.basename(path)))
+
+    s3_client.put_object(
+        Bucket=DOCUMENTATION_BUCKET,
+        Key=os.path.join(INDEX_S3_FOLDER, "latest.json"),
+        Body=json.dumps({'run_id': run_metrics.run_id, 'folder': index_folder}).encode('utf-8'),
+        ContentType='application/json'
+    )
+
+    logger.info(f"Uploaded retrieval index {index_folder} with {len(chunks)} passages in {perf_counter() - start:.1f} seconds")
+
 def sync_knowledgebases():
     """
     Syncs content knowledge bases.
@@ -307,14 +762,39 @@ def sync_knowledgebases():
 
 def lambda_handler(event, context):
 
-    download_and_upload_github(DOCUMENTATION_REPOS)
-    run_scraper(DOCUMENTATION_SITES + POLICY_SITES)
-    download_and_upload_books()
-    sync_knowledgebases()
+    global run_metrics, index_documents
+    run_metrics = RunMetrics()
+    index_documents = []
+    status = "failed"
+
+    # The report is published even when a step fails so the failed run can be inspected
+    try:
+        with run_metrics.timed_stage('github'):
+            download_and_upload_github(DOCUMENTATION_REPOS)
+
+        with run_metrics.timed_stage('crawl'):
+            run_scraper(DOCUMENTATION_SITES + POLICY_SITES)
+
+        with run_metrics.timed_stage('books'):
+            download_and_upload_books()
+
+        with run_metrics.timed_stage('sync'):
+            sync_knowledgebases()
+
+        # The retrieval index is optional, so a failed build is logged without failing the run
+        with run_metrics.timed_stage('retrieval_index'):
+            try:
+                build_retrieval_index(index_documents)
+            except Exception as e:
+                logger.error(f"Retrieval index build failed: {str(e)}")
+
+        status = "succeeded"
+    finally:
+        report = publish_run_report(status)
 
     response = {
         "statusCode": 200,
-        "body": ""
+        "body": json.dumps({"run_id": report['run_id'], "totals": report['totals']})
     }
 
     logger.info("Response: %s", response)
@@ -12,7 +12,7 @@ logger.setLevel(logging.INFO)
 def lambda_handler(event, context):
 
     # gather dependencies
-    os.system(f"pip install -t {ROOT_PATH} scrapy")
+    os.system(f"pip install -t {ROOT_PATH} scrapy numpy")
     
     s3 = boto3.client('s3')
 